@@ -1,12 +1,19 @@
 import argparse
+import contextlib
+import hashlib
+import io
+import tarfile
+import threading
 import time
 import pathlib
 import os
-import yaml
 import re
-import json
-from dotenv import load_dotenv
-from netmiko import ConnectHandler
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from inventory_core import json_bytes, load_host_cfgs
+from _ssh_pool import borrow, set_connect_rate, throttle_connect
+
+_INLINE_COMMENT = re.compile(r"\s+#.*$")  # "show ver  # commentaire"
+_SKIP = re.compile(r"^\s*(?:[!#].*)?$")  # ligne vide, "! ..." ou "# ..."
 
 
 def timestamp():
@@ -19,111 +26,296 @@ def parse_args():
     p.add_argument("--commands", default="src/ssh/commands.txt")
     p.add_argument("--outdir", default="outputs/show")
     p.add_argument("--save-raw", action="store_true")
+    p.add_argument(
+        "--raw-format",
+        choices=["dir", "tar"],
+        default="dir",
+        help="--save-raw: un .txt par commande (dir) ou une archive par host (tar)",
+    )
+    p.add_argument(
+        "--stream",
+        action="store_true",
+        help="Écrit chaque sortie sur disque dès réception (JSON = index seulement)",
+    )
+    p.add_argument(
+        "--workers", type=int, default=16, help="Nombre de hosts traités en parallèle"
+    )
+    p.add_argument(
+        "--rate-limit",
+        type=int,
+        default=10,
+        help="Handshakes SSH simultanés max (cf. MaxStartups d'OpenSSH)",
+    )
+    p.add_argument(
+        "--new-conn-rate",
+        type=float,
+        default=5,
+        help="Nouvelles connexions SSH par seconde (0 = illimité)",
+    )
+    p.add_argument(
+        "--new-conn-burst",
+        type=int,
+        default=8,
+        help="Rafale max de nouvelles connexions SSH",
+    )
+    p.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Envoie toutes les commandes en une seule écriture sur le canal SSH",
+    )
+    p.add_argument(
+        "--exec-channels",
+        action="store_true",
+        help="Une session SSH par host, un canal exec par commande (sans enable)",
+    )
+    p.add_argument(
+        "--max-sessions",
+        type=int,
+        default=10,
+        help="Canaux exec simultanés par host (MaxSessions côté équipement)",
+    )
     return p.parse_args()
 
 
-def env_interp(v):
-    if isinstance(v, str) and v.startswith("${") and v.endswith("}"):
-        return os.getenv(v[2:-1], "")
-    return v
-
-
-def load_inventory(path):
-    load_dotenv()  # lit .env
-    with open(path) as f:
-        data = yaml.safe_load(f) or {}
-    defaults = {k: env_interp(v) for k, v in (data.get("defaults") or {}).items()}
-    hosts = []
-    for name, h in (data.get("hosts") or {}).items():
-        h = {k: env_interp(v) for k, v in (h or {}).items()}
-        cfg = dict(defaults)
-        cfg.update(h)  # defaults < host
-        host_cfg = {
-            "name": name,
-            "host": cfg["host"],
-            "device_type": cfg.get("device_type"),
-            "username": cfg.get("username"),
-            "password": cfg.get("password"),
-            "secret": cfg.get("secret"),
-            "fast_cli": bool(cfg.get("fast_cli", True)),
-            "port": int(cfg.get("port", 22)),
-        }
-        hosts.append(host_cfg)
-    return hosts
-
-
 def load_commands(path):
-    cmds = []
-    with open(path, encoding="utf-8") as f:
-        for raw in f:
-            line = raw.rstrip("\r\n")  # normalise fin de ligne
-            line = re.sub(r"\s+#.*$", "", line)  # enlève commentaire inline
-            line = line.strip()
-            if not line:  # skip vides / comment-only
-                continue
-            cmds.append(line)
-    return cmds
+    # skip lignes vides / comment-only, puis enlève les commentaires inline
+    # un seul read() + splitlines() en C plutôt qu'une itération ligne à ligne
+    lines = pathlib.Path(path).read_text(encoding="utf-8").splitlines()
+    # la plupart des lignes n'ont pas de "#": pas de regex pour celles-là
+    return [
+        (_INLINE_COMMENT.sub("", line) if "#" in line else line).strip()
+        for line in lines
+        if not _SKIP.match(line)
+    ]
 
 
 def _select_creds(host_cfg):
     """Choisit user/pass selon groups + variables d'env. Fallback = valeurs host_cfg."""
-    groups = host_cfg.get("groups") or []
+    groups = host_cfg.groups
     if "nex" in groups:
-        user = os.getenv("SSH_NEX_USERNAME") or host_cfg.get("username")
-        pwd = os.getenv("SSH_NEX_PASSWORD") or host_cfg.get("password")
+        user = os.getenv("SSH_NEX_USERNAME") or host_cfg.username
+        pwd = os.getenv("SSH_NEX_PASSWORD") or host_cfg.password
         # force device_type si absent
-        if not host_cfg.get("device_type"):
-            host_cfg["device_type"] = "cisco_nxos"
+        if not host_cfg.device_type:
+            host_cfg.device_type = "cisco_nxos"
     else:
-        user = os.getenv("SSH_USERNAME") or host_cfg.get("username")
-        pwd = os.getenv("SSH_PASSWORD") or host_cfg.get("password")
+        user = os.getenv("SSH_USERNAME") or host_cfg.username
+        pwd = os.getenv("SSH_PASSWORD") or host_cfg.password
     return user, pwd
 
 
-def run_commands_on_host(host_cfg, commands):
+def _split_pipelined(raw, prompt, commands):
+    """
+    Découpe la sortie brute d'un envoi groupé sur les lignes de prompt.
+    return: dict {cmd: output}, ou None si le découpage ne colle pas
+    """
+    # chaque commande se termine par une ligne "<prompt><commande suivante>"
+    chunks = re.split(rf"^{re.escape(prompt)}.*$", raw, flags=re.M)
+    if len(chunks) != len(commands) + 1:
+        return None
+    results = {}
+    for cmd, chunk in zip(commands, chunks):
+        # le 1er morceau commence par l'écho de la commande
+        if chunk.lstrip("\n").startswith(cmd):
+            chunk = chunk.lstrip("\n")[len(cmd) :]
+        results[cmd] = chunk.strip("\n")
+    return results
+
+
+def _run_pipelined(conn, commands):
+    """
+    Écrit toutes les commandes d'un coup puis découpe la sortie sur le prompt.
+    return: dict {cmd: output}, ou None si le découpage ne colle pas
+    """
+    prompt = conn.find_prompt()
+    conn.write_channel(conn.RETURN.join(commands) + conn.RETURN)
+    # le prompt revient une fois par commande: on lit jusqu'au N-ième,
+    # sans délai d'inactivité fixe
+    pattern = re.escape(prompt)
+    raw = "".join(conn.read_until_pattern(pattern) for _ in commands)
+    return _split_pipelined(conn.normalize_linefeeds(raw), prompt, commands)
+
+
+class _ExecRefused(Exception):
+    """L'équipement refuse les canaux exec (session/exec_command)."""
+
+
+def _run_exec_channels(
+    host_cfg, user, pwd, commands, max_sessions=10, connect_slots=None
+):
+    """
+    Un seul transport Paramiko (handshake + auth une fois), puis un canal
+    exec par commande, jusqu'à max_sessions en parallèle.
+    return: dict {cmd: output}
+    raise: _ExecRefused si les canaux exec sont refusés (fallback possible);
+        les erreurs de connexion / d'auth remontent telles quelles
     """
-    host_cfg: dict avec host, device_type, username, password, secret, fast_cli, port
+    import paramiko
+
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+    # close() aussi si connect() échoue: sinon le thread Transport reste actif
+    try:
+        with connect_slots or contextlib.nullcontext():
+            throttle_connect()
+            client.connect(
+                host_cfg.host,
+                port=host_cfg.port,
+                username=user,
+                password=pwd,
+                look_for_keys=False,
+                allow_agent=False,
+                timeout=30,
+            )
+        transport = client.get_transport()
+
+        def _exec(cmd):
+            try:
+                chan = transport.open_session()
+            except Exception as e:
+                raise _ExecRefused(e) from e
+            try:
+                chan.settimeout(60)
+                try:
+                    chan.exec_command(cmd)
+                except Exception as e:
+                    raise _ExecRefused(e) from e
+                data = b"".join(iter(lambda: chan.recv(65536), b""))
+                return data.decode("utf-8", "replace")
+            finally:
+                chan.close()
+
+        with ThreadPoolExecutor(max_workers=max(1, max_sessions)) as ex:
+            return dict(zip(commands, ex.map(_exec, commands)))
+    finally:
+        client.close()
+
+
+def run_commands_on_host(
+    host_cfg,
+    commands,
+    connect_slots=None,
+    pipeline=False,
+    exec_channels=False,
+    max_sessions=10,
+    outdir=None,
+    host_name=None,
+):
+    """
+    host_cfg: HostCfg (host, device_type, username, password, secret, fast_cli, port)
     commands: list[str]
+    connect_slots: sémaphore optionnel limitant les handshakes SSH simultanés
+    pipeline: envoie toutes les commandes en un seul write (fallback une à une)
+    exec_channels: canaux exec Paramiko multiplexés (fallback Netmiko si refusé)
+    outdir/host_name: si fournis, chaque sortie part sur disque dès réception et
+        results[cmd] = {"path", "bytes", "blake2b"} au lieu du texte
     return: dict {cmd: output} (+ "__error__" si échec)
     """
     results = {}
+    prefix = os.fspath(outdir / f"{host_name}__") if outdir is not None else None
+
+    def _keep(cmd, out):
+        if outdir is None:
+            results[cmd] = out
+            return
+        path = f"{prefix}{safe_name(cmd)}.txt"
+        data = out.encode("utf-8")
+        _write_raw(path, data)
+        results[cmd] = {
+            "path": path,
+            "bytes": len(data),
+            "blake2b": hashlib.blake2b(data, digest_size=16).hexdigest(),
+        }
+
     user, pwd = _select_creds(host_cfg)
+    # pas d'enable possible en canal exec -> chemin Netmiko si secret
+    if exec_channels and commands and not host_cfg.secret:
+        try:
+            outs = _run_exec_channels(
+                host_cfg, user, pwd, commands, max_sessions, connect_slots
+            )
+        except _ExecRefused:
+            outs = None  # exec refusé par l'équipement -> chemin Netmiko ci-dessous
+        except Exception as e:
+            # connexion / auth: pas de 2e login Netmiko (verrouillage de compte)
+            results["__error__"] = str(e)
+            return results
+        if outs is not None:
+            for cmd, out in outs.items():
+                _keep(cmd, out)
+            return results
     dev = {
-        "device_type": host_cfg["device_type"],
-        "host": host_cfg["host"],
+        "device_type": host_cfg.device_type,
+        "host": host_cfg.host,
         "username": user,
         "password": pwd,
-        "fast_cli": host_cfg["fast_cli"],
-        "port": host_cfg["port"],
+        "fast_cli": host_cfg.fast_cli,
+        "port": host_cfg.port,
     }
-    if host_cfg.get("secret"):
-        dev["secret"] = host_cfg["secret"]
+    if host_cfg.secret:
+        dev["secret"] = host_cfg.secret
 
     try:
-        with ConnectHandler(**dev) as conn:
-            if host_cfg.get("secret"):
+        with borrow(dev, connect_slots) as conn:
+            if host_cfg.secret:
                 conn.enable()
-            for cmd in commands:
-                out = conn.send_command(cmd)
-                results[cmd] = out
+            if pipeline and commands:
+                for cmd, out in (_run_pipelined(conn, commands) or {}).items():
+                    _keep(cmd, out)
+            if not results:
+                # un seul find_prompt par host (send_command en ferait un par cmd)
+                expect = re.escape(conn.find_prompt())
+                for cmd in commands:
+                    _keep(cmd, conn.send_command(cmd, expect_string=expect))
     except Exception as e:
         results["__error__"] = str(e)
     return results
 
 
+def _write_raw(path: str, data: bytes) -> None:
+    # os.open/os.write: pas de Path ni de TextIOWrapper par fichier
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # os.write peut écrire moins que demandé: on boucle jusqu'au bout
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
 def safe_name(s: str) -> str:
     return s.replace(" ", "_").replace("|", "_").replace("/", "_")
 
 
-def save_results(outdir: pathlib.Path, host_name: str, results: dict, save_raw: bool):
+def save_results(
+    outdir: pathlib.Path,
+    host_name: str,
+    results: dict,
+    save_raw: bool,
+    raw_format: str = "dir",
+):
     # JSON par host
-    (outdir / f"{host_name}.json").write_text(json.dumps(results, indent=2))
+    (outdir / f"{host_name}.json").write_bytes(json_bytes(results))
 
-    if save_raw:
-        for cmd, out in results.items():
-            if cmd.startswith("__"):  # ne pas créer de txt pour __error__
-                continue
-            (outdir / f"{host_name}__{safe_name(cmd)}.txt").write_text(out)
+    if not save_raw:
+        return
+    # ne pas créer de txt pour __error__
+    raw = [(cmd, out) for cmd, out in results.items() if not cmd.startswith("__")]
+    if raw_format == "tar":
+        # une seule archive par host au lieu d'un petit fichier par commande
+        with tarfile.open(outdir / f"{host_name}.tar", "w") as tf:
+            for cmd, out in raw:
+                data = out.encode("utf-8")
+                ti = tarfile.TarInfo(f"{safe_name(cmd)}.txt")
+                ti.size = len(data)
+                ti.mtime = int(time.time())
+                tf.addfile(ti, io.BytesIO(data))
+    else:
+        prefix = os.fspath(outdir / f"{host_name}__")
+        for cmd, out in raw:
+            _write_raw(f"{prefix}{safe_name(cmd)}.txt", out.encode("utf-8"))
 
 
 def main():
@@ -135,12 +327,32 @@ def main():
     print(f"Écrira les résultats dans: {outdir}")
     commands = load_commands(args.commands)
     print("Commandes:", commands)
-    hosts = load_inventory(args.inventory)
-    print("Inventaire:", [h["name"] for h in hosts])
-    for h in hosts:
-        print(f"===> {h['name']} ({h['host']})")
-        results = run_commands_on_host(h, commands)
-        save_results(outdir, h["name"], results, args.save_raw)
+    hosts = load_host_cfgs(args.inventory)
+    print("Inventaire:", [h.name for h in hosts])
+    connect_slots = threading.BoundedSemaphore(max(1, args.rate_limit))
+    set_connect_rate(args.new_conn_rate, args.new_conn_burst)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futures = {
+            ex.submit(
+                run_commands_on_host,
+                h,
+                commands,
+                connect_slots,
+                pipeline=args.pipeline,
+                exec_channels=args.exec_channels,
+                max_sessions=args.max_sessions,
+                outdir=outdir if args.stream else None,
+                host_name=h.name,
+            ): h
+            for h in hosts
+        }
+        # écritures disque sérialisées sur le thread principal
+        for fut in as_completed(futures):
+            h = futures[fut]
+            print(f"===> {h.name} ({h.host})")
+            # en --stream les sorties brutes sont déjà sur disque
+            save_raw = args.save_raw and not args.stream
+            save_results(outdir, h.name, fut.result(), save_raw, args.raw_format)
 
     print(f"✔ Terminé. Résultats dans {outdir}")
 
@@ -0,0 +1,194 @@
+"""Netmiko connections, optionally pooled across runs in one process.
+
+``borrow(params)`` lends a connected ``ConnectHandler`` for the given
+connection parameters. By default it disconnects on exit, like
+``with ConnectHandler(...)``: the scripts talk to each host once.
+Long-lived callers that revisit the same devices can ``set_pooling(True)``;
+connections are then taken back on exit, so later runs skip the SSH
+handshake + auth. Idle connections are kept alive by a background thread
+and closed at interpreter exit.
+
+New connections are paced by a shared token bucket (``set_connect_rate``)
+so bursts of handshakes stay under the remote sshd's MaxStartups limit.
+"""
+
+import atexit
+import collections
+import contextlib
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+KEEPALIVE_INTERVAL = 30  # seconds between keepalives on idle connections
+
+_SECRET_KEYS = ("password", "secret")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``take()`` blocks until a token is free."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> None:
+        if self.rate <= 0:  # rate 0 = unlimited
+            return
+        # sleeping under the lock queues callers in arrival order
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 0.0
+                self.last = time.monotonic()
+            else:
+                self.tokens -= 1
+
+
+_bucket = TokenBucket(rate=5, burst=8)
+
+_lock = threading.Lock()
+_idle: Dict[Tuple, collections.deque] = collections.defaultdict(collections.deque)
+_keepalive_thread = None
+_pooling = False
+
+
+def set_pooling(enabled: bool) -> None:
+    """Keep connections open between ``borrow()`` calls (off by default)."""
+    global _pooling
+    _pooling = enabled
+    if not enabled:
+        drain()
+
+
+def set_connect_rate(rate: float, burst: int) -> None:
+    """Pace new SSH connections to ``rate``/s with bursts of ``burst``."""
+    global _bucket
+    _bucket = TokenBucket(rate, burst)
+
+
+def throttle_connect() -> None:
+    """Block until the shared bucket allows one more SSH handshake."""
+    _bucket.take()
+
+
+def _key(params: Dict[str, Any]) -> Tuple:
+    """Pool key: connection params, with secrets hashed rather than kept."""
+    items = [(k, v) for k, v in params.items() if k not in _SECRET_KEYS]
+    digest = hashlib.sha256(
+        "\0".join(str(params.get(k) or "") for k in _SECRET_KEYS).encode()
+    ).hexdigest()
+    return tuple(sorted(items)) + (("_secrets", digest),)
+
+
+def _close(conn) -> None:
+    try:
+        conn.disconnect()
+    except Exception:
+        pass
+
+
+def _healthy(conn) -> bool:
+    """Bring the session back to exec mode and check the prompt answers."""
+    try:
+        if conn.check_config_mode():
+            conn.exit_config_mode()
+        conn.find_prompt()
+        return True
+    except Exception:
+        return False
+
+
+def _keepalive_loop() -> None:
+    while True:
+        time.sleep(KEEPALIVE_INTERVAL)
+        batch = []
+        with _lock:
+            for k, q in _idle.items():
+                batch.extend((k, conn) for conn in q)
+                q.clear()
+        # network I/O outside the lock; find_prompt() sends "\n" and reads back
+        for k, conn in batch:
+            if _healthy(conn):
+                with _lock:
+                    _idle[k].append(conn)
+            else:
+                _close(conn)
+
+
+def _ensure_keepalive() -> None:
+    global _keepalive_thread
+    with _lock:
+        if _keepalive_thread is None:
+            _keepalive_thread = threading.Thread(
+                target=_keepalive_loop, name="ssh-pool-keepalive", daemon=True
+            )
+            _keepalive_thread.start()
+
+
+def _connect(params: Dict[str, Any], connect_slots=None):
+    # imported lazily: netmiko pulls in paramiko, cryptography, textfsm...
+    from netmiko import ConnectHandler
+
+    with connect_slots or contextlib.nullcontext():
+        throttle_connect()
+        return ConnectHandler(**params)
+
+
+@contextlib.contextmanager
+def borrow(params: Dict[str, Any], connect_slots=None):
+    """
+    Yield a connected ConnectHandler for ``params`` (ConnectHandler kwargs).
+
+    connect_slots: optional semaphore held only while a new connection is
+    being established (caps concurrent handshakes).
+    """
+    if not _pooling:
+        conn = _connect(params, connect_slots)
+        try:
+            yield conn
+        finally:
+            _close(conn)
+        return
+
+    key = _key(params)
+    while True:
+        with _lock:
+            q = _idle.get(key)
+            conn = q.popleft() if q else None
+        if conn is None or conn.is_alive():
+            break
+        _close(conn)
+    if conn is None:
+        conn = _connect(params, connect_slots)
+        _ensure_keepalive()
+
+    try:
+        yield conn
+    except BaseException:
+        _close(conn)
+        raise
+
+    if _healthy(conn):
+        with _lock:
+            _idle[key].appendleft(conn)
+    else:
+        _close(conn)
+
+
+def drain() -> None:
+    """Disconnect every idle connection held by the pool."""
+    with _lock:
+        conns = [conn for q in _idle.values() for conn in q]
+        _idle.clear()
+    for conn in conns:
+        _close(conn)
+
+
+atexit.register(drain)
@@ -0,0 +1,68 @@
+"""On-disk cache of parsed inventory YAML, keyed by path + mtime + size.
+
+Only the raw parse result is pickled: ${VAR} interpolation still happens in
+the callers, so ${VAR} credentials never hit the cache. Values written inline
+in the YAML (password: ...) do, so the cache directory is created 0700 and
+its files 0600.
+"""
+
+import hashlib
+import os
+import pathlib
+import pickle
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as _YL  # libyaml, ~5-10x faster
+except ImportError:
+    from yaml import SafeLoader as _YL
+
+CACHE_DIR = pathlib.Path(
+    os.getenv("NET_LAB_CACHE_DIR") or "~/.cache/net-lab"
+).expanduser()
+
+
+def _cache_file(path: pathlib.Path) -> pathlib.Path:
+    digest = hashlib.blake2b(str(path).encode(), digest_size=8).hexdigest()
+    return CACHE_DIR / f"inventory-{digest}.pkl"
+
+
+def _trusted(cache_file: pathlib.Path) -> bool:
+    """Unpickle only our own, private files (the directory can be redirected)."""
+    st = cache_file.stat()
+    uid = getattr(os, "getuid", None)
+    return (uid is None or st.st_uid == uid()) and not st.st_mode & 0o077
+
+
+def load_yaml(path):
+    """yaml.safe_load(path), served from the cache while the file is unchanged."""
+    p = pathlib.Path(path).resolve()
+    st = p.stat()
+    key = (str(p), st.st_mtime_ns, st.st_size)
+    cache_file = _cache_file(p)
+
+    try:
+        if _trusted(cache_file):
+            cached_key, data = pickle.loads(cache_file.read_bytes())
+            if cached_key == key:
+                return data
+    except Exception:
+        pass  # missing, corrupt or stale format -> reparse
+
+    # binary handle: the loader decodes itself and reads in its own chunks,
+    # so the file is never held as both bytes and str
+    with open(p, "rb") as f:
+        data = yaml.load(f, Loader=_YL)
+
+    try:
+        CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        payload = pickle.dumps((key, data), protocol=pickle.HIGHEST_PROTOCOL)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, cache_file)  # atomic: never read a half-written cache
+    except OSError:
+        pass  # best effort (read-only HOME, etc.)
+    return data
@@ -0,0 +1,273 @@
+"""Shared inventory loader for the src/ssh scripts.
+
+Nornir-style YAML (defaults -> groups -> host), ${VAR} expansion from the
+environment / .env, and type coercion. Results are memoized per
+(path, mtime) so repeated calls in one process cost a dict copy.
+"""
+
+import copy
+import functools
+import json
+import os
+import pathlib
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Tuple
+
+from inventory_cache import load_yaml
+
+try:  # orjson (optional): C serializer, yields bytes directly
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_DOTENV_LOADED = False
+
+
+def _ensure_dotenv() -> None:
+    """Load .env (optional python-dotenv, for ${SSH_*} in YAML) once per process."""
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    _DOTENV_LOADED = True
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    except Exception:
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def _env(name: str) -> str:
+    # the environment is fixed once .env is loaded; call _env.cache_clear()
+    # after changing os.environ in-process (tests)
+    _ensure_dotenv()  # no-op after the first inventory load
+    return os.environ.get(name, "")
+
+
+def env_interp(v: Any) -> Any:
+    # most leaves are plain literals: one char scan and out
+    if not isinstance(v, str) or "$" not in v:
+        return v
+    if v.startswith("${") and v.endswith("}"):
+        return _env(v[2:-1])
+    return v
+
+
+def _deep_expand_env(x: Any) -> Any:
+    if isinstance(x, str):
+        return env_interp(x)
+    if isinstance(x, dict):
+        return {k: _deep_expand_env(v) for k, v in x.items()}
+    if isinstance(x, list):
+        return [_deep_expand_env(v) for v in x]
+    return env_interp(x)
+
+
+def _merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    # shallow on purpose: merged values are scalars / lists we never mutate
+    out = dict(a) if a else {}
+    out.update(b or {})
+    return out
+
+
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
+def _to_bool(val: Any) -> Any:
+    if isinstance(val, bool):
+        return val
+    if isinstance(val, str):
+        return val.strip().lower() in _TRUTHY
+    return val
+
+
+def _to_int(val: Any) -> Any:
+    try:
+        return int(val)
+    except Exception:
+        return val  # non-numeric value left as-is
+
+
+# (key, default, coerce): fields every materialized host carries
+_FIELD_SPEC = (
+    ("device_type", None, None),
+    ("username", None, None),
+    ("password", None, None),
+    ("secret", None, None),
+    ("fast_cli", True, _to_bool),
+    ("port", 22, _to_int),
+)
+
+
+def _materialize_host(
+    name: str, cfg: Dict[str, Any], defaults: Dict[str, Any], groups_def: Dict[str, Any]
+) -> Dict[str, Any]:
+    """defaults -> groups -> host (defaults/groups pre-expanded by _load), then coerce."""
+    cfg = _deep_expand_env(cfg or {})
+    base = dict(defaults or {})
+    for g in cfg.get("groups") or []:
+        if groups_def and g in groups_def:
+            base = _merge(base, groups_def[g])
+    base = _merge(base, cfg)
+    base["name"] = name
+    for k, default, coerce in _FIELD_SPEC:
+        v = base.get(k, default)
+        base[k] = coerce(v) if coerce else v
+    base["groups"] = list(base.get("groups") or [])  # never shared between hosts
+    if "use_scp" in base:
+        base["use_scp"] = _to_bool(base["use_scp"])
+    return base
+
+
+@functools.lru_cache(maxsize=4)
+def _load(path: str, mtime_ns: int) -> Tuple[Dict[str, Any], ...]:
+    data = load_yaml(path) or {}
+
+    if isinstance(data, dict) and isinstance(data.get("hosts"), dict):
+        # defaults / groups are expanded once per inventory, not once per host
+        defaults = _deep_expand_env(data.get("defaults") or {})
+        groups_def = _deep_expand_env(data.get("groups") or {})
+        return tuple(
+            _materialize_host(name, cfg or {}, defaults, groups_def)
+            for name, cfg in data["hosts"].items()
+        )
+    # Simple formats: a list of hosts, or {hosts: [...]}
+    if isinstance(data, dict) and isinstance(data.get("hosts"), list):
+        return tuple(data["hosts"])
+    if isinstance(data, list):
+        return tuple(data)
+    raise ValueError("Invalid inventory: expected Nornir-style or a list of hosts.")
+
+
+def _hosts(path: str) -> Tuple[Dict[str, Any], ...]:
+    _ensure_dotenv()
+    inv_file = pathlib.Path(path).resolve()
+    if not inv_file.exists():
+        raise FileNotFoundError(f"Inventory not found: {path}")
+    return _load(str(inv_file), inv_file.stat().st_mtime_ns)
+
+
+def load_inventory(path: str = "src/ssh/inventory.yaml") -> List[Dict[str, Any]]:
+    """
+    Return the materialized hosts of ``path`` (one dict per host).
+
+    Each call hands out fresh copies (groups lists and other nested values
+    included), so callers may tweak them (e.g. force device_type) without
+    touching the memoized copy.
+    """
+    return copy.deepcopy(list(_hosts(path)))
+
+
+@dataclass(slots=True)
+class HostCfg:
+    """Fixed-shape host record for the scripts that only need connection fields."""
+
+    name: str
+    host: str
+    device_type: str | None = None
+    username: str | None = None
+    password: str | None = None
+    secret: str | None = None
+    fast_cli: bool = True
+    port: int = 22
+    groups: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, h: Dict[str, Any]) -> "HostCfg":
+        kw = {k: h[k] for k in _HOSTCFG_FIELDS if k in h}
+        kw["groups"] = tuple(h.get("groups") or ())
+        return cls(**kw)
+
+
+_HOSTCFG_FIELDS = tuple(f.name for f in fields(HostCfg))
+
+
+def load_host_cfgs(path: str = "src/ssh/inventory.yaml") -> List[HostCfg]:
+    """Same as load_inventory(), as HostCfg records (extra YAML keys dropped)."""
+    return [HostCfg.from_dict(h) for h in _hosts(path)]
+
+
+_NAPALM = {
+    "cisco_ios": "ios",
+    "ios": "ios",
+    "cisco_xe": "ios",
+    "iosxe": "ios",
+    "cisco_xr": "iosxr",
+    "cisco_xr_ssh": "iosxr",
+    "cisco_xr_telnet": "iosxr",
+    "iosxr": "iosxr",
+    "xr": "iosxr",
+    "cisco_nxos": "nxos",
+    "cisco_nxos_ssh": "nxos",
+    "nxos": "nxos",
+    "nxos_ssh": "nxos",
+}
+
+
+def napalm_driver(devtype: str | None) -> str:
+    """Map a Netmiko-style device_type to its NAPALM driver name."""
+    dt = (devtype or "").lower()
+    driver = _NAPALM.get(dt)
+    if driver:
+        return driver
+    # types not listed: substring match, as the scripts always did
+    if "xr" in dt:
+        return "iosxr"
+    if "nxos" in dt:
+        return "nxos"
+    return "ios"
+
+
+_NETMIKO = {
+    "cisco_ios": "cisco_ios",
+    "ios": "cisco_ios",
+    "cisco_xe": "cisco_ios",
+    "iosxe": "cisco_ios",
+    "cisco_xr": "cisco_xr",
+    "cisco_xr_ssh": "cisco_xr",
+    "cisco_xr_telnet": "cisco_xr",
+    "iosxr": "cisco_xr",
+    "xr": "cisco_xr",
+    "cisco_nxos": "cisco_nxos",
+    "cisco_nxos_ssh": "cisco_nxos",
+    "nxos": "cisco_nxos",
+    "nxos_ssh": "cisco_nxos",
+}
+_DEFAULT_FS = {"cisco_nxos": "bootflash:", "cisco_xr": "disk0:"}  # else flash:
+
+
+def netmiko_driver(devtype: str | None) -> str:
+    """Map a device_type alias to its Netmiko driver (cisco_xr/_nxos/_ios)."""
+    dt = (devtype or "").lower()
+    driver = _NETMIKO.get(dt)
+    if driver:
+        return driver
+    # types not listed: substring match, as the scripts always did
+    if "xr" in dt:
+        return "cisco_xr"
+    if "nx" in dt:
+        return "cisco_nxos"
+    return "cisco_ios"
+
+
+def default_fs(devtype: str | None) -> str:
+    """Default config filesystem for a device_type (bootflash:, disk0:, flash:)."""
+    return _DEFAULT_FS.get(netmiko_driver(devtype), "flash:")
+
+
+def json_bytes(obj: Any, default=None) -> bytes:
+    """Indented JSON as UTF-8 bytes, through orjson when it is installed."""
+    if orjson is None:
+        return json.dumps(obj, indent=2, default=default).encode("utf-8")
+    return orjson.dumps(
+        obj, default=default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def print_json(obj: Any) -> None:
+    """Pretty JSON to stdout (non-JSON values via str())."""
+    sys.stdout.flush()  # keep ordering with earlier print() output
+    sys.stdout.buffer.write(json_bytes(obj, default=str) + b"\n")
@@ -1,81 +1,82 @@
 # src/ssh/napalm_backup_all.py
+import argparse
+import contextlib
 import os
-import json
 import pathlib
+import threading
 import time
-import yaml
-from napalm import get_network_driver
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from inventory_core import json_bytes, load_host_cfgs, napalm_driver
 
 
 def ts():
     return time.strftime("%Y%m%d-%H%M%S")
 
 
-def env_interp(v):
-    if isinstance(v, str) and v.startswith("${") and v.endswith("}"):
-        return os.getenv(v[2:-1], "")
-    return v
+def parse_args():
+    p = argparse.ArgumentParser(description="NAPALM backup (config + facts)")
+    p.add_argument("--inventory", default="src/ssh/inventory.yaml")
+    p.add_argument("--outdir", default="outputs/napalm_backups")
+    p.add_argument(
+        "--workers", type=int, default=16, help="Nombre de hosts traités en parallèle"
+    )
+    p.add_argument(
+        "--rate-limit",
+        type=int,
+        default=10,
+        help="Handshakes SSH simultanés max (cf. MaxStartups d'OpenSSH)",
+    )
+    p.add_argument(
+        "--retrieve",
+        choices=["all", "running"],
+        default="all",
+        help="Configs à récupérer (running = un aller-retour de moins par host)",
+    )
+    return p.parse_args()
 
 
 def _select_creds(host_cfg):
     """Choisit les credentials en fonction du groupe."""
-    groups = host_cfg.get("groups", [])
+    groups = host_cfg.groups
     # Host override direct
-    user = host_cfg.get("username")
-    pwd = host_cfg.get("password")
+    user = host_cfg.username
+    pwd = host_cfg.password
 
     if "nex" in groups:  # NX-OS
         user = user or os.getenv("SSH_NEX_USERNAME")
         pwd = pwd or os.getenv("SSH_NEX_PASSWORD")
-        if not host_cfg.get("device_type"):
-            host_cfg["device_type"] = "cisco_nxos"
+        if not host_cfg.device_type:
+            host_cfg.device_type = "cisco_nxos"
 
     else:  # par défaut IOS/IOS-XE
         user = user or os.getenv("SSH_USERNAME")
         pwd = pwd or os.getenv("SSH_PASSWORD")
-        if not host_cfg.get("device_type"):
-            host_cfg["device_type"] = "cisco_ios"
+        if not host_cfg.device_type:
+            host_cfg.device_type = "cisco_ios"
 
     return user, pwd
 
 
 def load_inventory(path="src/ssh/inventory.yaml"):
-    load_dotenv()
-    with open(path) as f:
-        data = yaml.safe_load(f) or {}
-    defaults = {k: env_interp(v) for k, v in (data.get("defaults") or {}).items()}
-    hosts = []
-    for name, h in (data.get("hosts") or {}).items():
-        h = {k: env_interp(v) for k, v in (h or {}).items()}
-        cfg = dict(defaults)
-        cfg.update(h)
-        cfg["name"] = name
-        user, pwd = _select_creds(cfg)
-        cfg["username"], cfg["password"] = user, pwd
-        hosts.append(cfg)
+    hosts = load_host_cfgs(path)
+    for cfg in hosts:
+        cfg.username, cfg.password = _select_creds(cfg)
     return hosts
 
 
 def connect(h):
-    devtype = (h.get("device_type") or "cisco_ios").lower()
-    if "xr" in devtype:
-        driver = "iosxr"
-    elif "nxos" in devtype:
-        driver = "nxos"
-    else:
-        driver = "ios"
-
-    drv = get_network_driver(driver)
+    from napalm import get_network_driver  # import lourd, seulement si connexion
+
+    drv = get_network_driver(napalm_driver(h.device_type))
     optional = {}
-    if h.get("secret"):
-        optional["secret"] = h["secret"]
-    if h.get("port"):
-        optional["port"] = int(h["port"])
+    if h.secret:
+        optional["secret"] = h.secret
+    if h.port:
+        optional["port"] = int(h.port)
     dev = drv(
-        hostname=h["host"],
-        username=h["username"],
-        password=h["password"],
+        hostname=h.host,
+        username=h.username,
+        password=h.password,
         optional_args=optional,
         timeout=60,
     )
@@ -83,34 +84,57 @@ def connect(h):
     return dev
 
 
+def backup_host(h, connect_slots=None, retrieve="all"):
+    """Récupère configs + facts d'un host. Retourne (entry, cfgs, facts)."""
+    entry = {"host": h.name, "ip": h.host, "ok": False}
+    cfgs, facts = {}, None
+    try:
+        # le sémaphore n'est tenu que pendant connexion + auth
+        with connect_slots or contextlib.nullcontext():
+            dev = connect(h)
+        cfgs = dev.get_config(retrieve=retrieve)
+        facts = dev.get_facts()
+        dev.close()
+        entry["ok"] = True
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry, cfgs, facts
+
+
 def main():
-    outdir = pathlib.Path("outputs/napalm_backups") / ts()
+    args = parse_args()
+    outdir = pathlib.Path(args.outdir) / ts()
     outdir.mkdir(parents=True, exist_ok=True)
     results = []
 
-    for h in load_inventory():
-        if h["name"] in ("IOS_XRv", "Ubuntu_Devbox"):
-            print(f"⏭ Skipping {h['name']} ({h['host']})")
+    hosts = []
+    for h in load_inventory(args.inventory):
+        if h.name in ("IOS_XRv", "Ubuntu_Devbox"):
+            print(f"⏭ Skipping {h.name} ({h.host})")
             continue  # on saute uniquement ce host
-
-        print(f"===> Backup {h['name']} ({h['host']}) group={h.get('groups')}")
-        entry = {"host": h["name"], "ip": h["host"], "ok": False}
-        try:
-            dev = connect(h)
-            cfgs = dev.get_config()
-            (outdir / f"{h['name']}.running.cfg").write_text(cfgs.get("running", ""))
-            if cfgs.get("startup"):
-                (outdir / f"{h['name']}.startup.cfg").write_text(cfgs["startup"])
-            facts = dev.get_facts()
-            (outdir / f"{h['name']}.facts.json").write_text(json.dumps(facts, indent=2))
-            dev.close()
-            entry["ok"] = True
-        except Exception as e:
-            (outdir / f"{h['name']}_ERROR.txt").write_text(f"{type(e).__name__}: {e}")
-            entry["error"] = f"{type(e).__name__}: {e}"
-        results.append(entry)
-
-    (outdir / "_summary.json").write_text(json.dumps(results, indent=2))
+        hosts.append(h)
+
+    connect_slots = threading.BoundedSemaphore(max(1, args.rate_limit))
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futures = {
+            ex.submit(backup_host, h, connect_slots, args.retrieve): h for h in hosts
+        }
+        # écritures disque sérialisées sur le thread principal
+        for fut in as_completed(futures):
+            h = futures[fut]
+            print(f"===> Backup {h.name} ({h.host}) group={list(h.groups)}")
+            entry, cfgs, facts = fut.result()
+            if cfgs:
+                (outdir / f"{h.name}.running.cfg").write_text(cfgs.get("running", ""))
+                if cfgs.get("startup"):
+                    (outdir / f"{h.name}.startup.cfg").write_text(cfgs["startup"])
+            if facts is not None:
+                (outdir / f"{h.name}.facts.json").write_bytes(json_bytes(facts))
+            if "error" in entry:
+                (outdir / f"{h.name}_ERROR.txt").write_text(entry["error"])
+            results.append(entry)
+
+    (outdir / "_summary.json").write_bytes(json_bytes(results))
     print(f"✔ backups saved in {outdir}")
 
 
@@ -4,125 +4,47 @@ import argparse
 import pathlib
 import sys
 import os
-import copy
-import yaml
+import re
 from typing import Any, Dict, List
-from netmiko import ConnectHandler
-
-# optional .env support (for ${SSH_*} in YAML)
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-except Exception:
-    pass
+from _ssh_pool import borrow
+from inventory_core import (
+    default_fs,
+    load_inventory as _load_inventory,
+    netmiko_driver,
+    print_json,
+)
+
+# applied to the whole snippet text at once (re.M), not line by line
+_SNIPPET_COMMENT = re.compile(r"^[ \t]*[!#].*$", re.M)
+# leading blanks, then a YAML bullet if any (not "--"): "- " only, so
+# "-  cmd" keeps one space; "-cmd" / "-\tcmd" -> "cmd"
+_BULLET = re.compile(r"^[ \t]*(?:-(?: |(?!-)[ \t]*))?", re.M)
+# one pass over the "dir" listing instead of one per error token
+_NX_DIR_BAD = re.compile(r"No such file or directory|Error|Invalid|not found")
 
 
 # ------------------------------
 # Inventory helpers
 # ------------------------------
-def _expand_env_val(v: Any) -> Any:
-    if isinstance(v, str) and v.startswith("${") and v.endswith("}"):
-        return os.getenv(v[2:-1], "")
-    return v
-
-
-def _deep_expand_env(x: Any) -> Any:
-    if isinstance(x, dict):
-        return {k: _deep_expand_env(v) for k, v in x.items()}
-    if isinstance(x, list):
-        return [_deep_expand_env(v) for v in x]
-    return _expand_env_val(x)
-
-
-def _merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
-    out = copy.deepcopy(a) if a else {}
-    for k, v in (b or {}).items():
-        out[k] = v
-    return out
-
-
-def _to_bool(val: Any) -> Any:
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, str):
-        return val.strip().lower() in ("1", "true", "yes", "on")
-    return val
-
-
-def _materialize_host(
-    name: str, cfg: Dict[str, Any], defaults: Dict[str, Any], groups_def: Dict[str, Any]
-) -> Dict[str, Any]:
-    base = copy.deepcopy(defaults or {})
-    for g in cfg.get("groups") or []:
-        if groups_def and g in groups_def:
-            base = _merge(base, groups_def[g])
-    base = _merge(base, cfg or {})
-    base["name"] = name
-    base = _deep_expand_env(base)
-    if "fast_cli" in base:
-        base["fast_cli"] = _to_bool(base["fast_cli"])
-    if "port" in base:
-        try:
-            base["port"] = int(base["port"])
-        except Exception:
-            pass
-    return base
-
-
 def load_inventory(path: str | None = None) -> List[Dict[str, Any]]:
-    inv_file = pathlib.Path(path or "inventory.yaml")
-    if not inv_file.exists():
-        raise FileNotFoundError(f"Inventory not found: {inv_file}")
-    data = yaml.safe_load(inv_file.read_text()) or {}
-
-    if isinstance(data, dict) and "hosts" in data and isinstance(data["hosts"], dict):
-        defaults = data.get("defaults", {}) or {}
-        groups_def = data.get("groups", {}) or {}
-        out = []
-        for name, cfg in data["hosts"].items():
-            out.append(_materialize_host(name, cfg or {}, defaults, groups_def))
-        return out
-    if isinstance(data, dict) and isinstance(data.get("hosts"), list):
-        return data["hosts"]
-    if isinstance(data, list):
-        return data
-    raise ValueError("Invalid inventory: expected Nornir-style or a list of hosts.")
+    return _load_inventory(path or "inventory.yaml")
 
 
 # ------------------------------
 # Platform helpers
 # ------------------------------
-def _netmiko_driver(devtype: str | None) -> str:
-    dt = (devtype or "cisco_ios").lower()
-    if "xr" in dt:
-        return "cisco_xr"
-    if "nx" in dt:
-        return "cisco_nxos"
-    return "cisco_ios"
-
-
-def _default_fs_for(devtype: str | None) -> str:
-    dt = (devtype or "").lower()
-    if "nx" in dt:
-        return "bootflash:"
-    if "xr" in dt:
-        return "disk0:"
-    return "flash:"
-
-
 # ------------------------------
 # Connection + snippet
 # ------------------------------
 def select_creds(h: Dict[str, Any]):
     user = (h.get("username") or "").strip()
     pwd = (h.get("password") or "").strip()
-    dt = (h.get("device_type") or "").lower()
+    platform = netmiko_driver(h.get("device_type"))
     if not user or not pwd:
-        if "nx" in dt:
+        if platform == "cisco_nxos":
             user = user or os.getenv("SSH_NEX_USERNAME", "")
             pwd = pwd or os.getenv("SSH_NEX_PASSWORD", "")
-        elif "xr" in dt:
+        elif platform == "cisco_xr":
             user = user or os.getenv("SSH_XR_USERNAME", "")
             pwd = pwd or os.getenv("SSH_XR_PASSWORD", "")
         else:
@@ -133,10 +55,10 @@ def select_creds(h: Dict[str, Any]):
     return user, pwd
 
 
-def connect_netmiko(h: Dict[str, Any]):
+def _netmiko_params(h: Dict[str, Any]) -> Dict[str, Any]:
     user, pwd = select_creds(h)
     params = {
-        "device_type": _netmiko_driver(h.get("device_type")),
+        "device_type": netmiko_driver(h.get("device_type")),
         "host": h["host"],
         "username": user,
         "password": pwd,
@@ -147,27 +69,16 @@ def connect_netmiko(h: Dict[str, Any]):
         params["secret"] = h["secret"]  # IOS/IOS-XE enable
     # Optional session log:
     # params["session_log"] = f"netmiko_{h.get('name','device')}.log"
-    return ConnectHandler(**params)
+    return params
 
 
 def _normalize_snippet_lines(snippet_path: pathlib.Path) -> List[str]:
     """Return clean CLI lines (remove blank, comments, YAML bullets)."""
-    out = []
-    for raw in snippet_path.read_text().splitlines():
-        s = raw.rstrip()
-        if not s:
-            continue
-        if s.lstrip().startswith(("!", "#")):
-            continue
-        t = s.lstrip()
-        if t.startswith("- "):  # "- command"
-            t = t[2:]
-        elif t.startswith("-") and not t.startswith(
-            "--"
-        ):  # "-no shutdown" -> "no shutdown"
-            t = t[1:].lstrip()
-        out.append(t)
-    return out
+    txt = _SNIPPET_COMMENT.sub("", snippet_path.read_text())
+    # "- command" / "-no shutdown" -> "command" / "no shutdown"
+    txt = _BULLET.sub("", txt)
+    lines = (line.rstrip() for line in txt.splitlines())
+    return [line for line in lines if line]
 
 
 # ------------------------------
@@ -180,22 +91,14 @@ def _nx_try_dir(conn, fs: str) -> bool:
         )
     except Exception:
         return False
-    bad = ("No such file or directory", "Error", "Invalid", "not found")
-    return not any(b in out for b in bad)
+    return _NX_DIR_BAD.search(out) is None
 
 
 def _nx_pick_fs(conn, h: Dict[str, Any], cli_dest_fs: str | None) -> str:
-    cand = []
-    if cli_dest_fs:
-        cand.append(cli_dest_fs)
-    if h.get("dest_file_system"):
-        cand.append(h["dest_file_system"])
-    cand += ["bootflash:", "flash:", "volatile:", "logflash:"]
-    seen = set()
-    for fs in cand:
-        if fs in seen:
-            continue
-        seen.add(fs)
+    cand = (cli_dest_fs, h.get("dest_file_system"))
+    cand += ("bootflash:", "flash:", "volatile:", "logflash:")
+    # ordered de-dup in one pass
+    for fs in dict.fromkeys(fs for fs in cand if fs):
         if _nx_try_dir(conn, fs):
             return fs
     # last resort: just return something; copy might still work
@@ -217,74 +120,77 @@ def netmiko_push(
 
     for h in hosts:
         name = h.get("name") or h.get("host")
-        devt = (h.get("device_type") or "").lower()
+        platform = netmiko_driver(h.get("device_type"))
         print(
             f"\n===> Netmiko push on {name} ({h.get('host')}) groups={h.get('groups')}"
         )
 
-        if "xr" in devt:
+        if platform == "cisco_xr":
             print(f"⏭ Skipping {name} (IOS-XR not supported in this Netmiko mode)")
             continue
 
         try:
-            conn = connect_netmiko(h)
-            _ = conn.send_command("terminal length 0", expect_string=r"#")
-
-            if "nx" in devt:
-                # Try SCP copy; fallback to direct CLI lines
-                scp_ok = False
-                try:
-                    fs = _nx_pick_fs(
-                        conn, h, cli_dest_fs or _default_fs_for(h.get("device_type"))
-                    )
-                    # verify FS (best effort)
-                    _ = conn.send_command(f"dir {fs}", expect_string=r"#")
-                    # raw SCP (no free-space parsing)
+            with borrow(_netmiko_params(h)) as conn:
+                _ = conn.send_command("terminal length 0", expect_string=r"#")
+
+                if platform == "cisco_nxos":
+                    # Try SCP copy; fallback to direct CLI lines
+                    scp_ok = False
                     try:
-                        try:
-                            from netmiko import SCPConn
-                        except Exception:
-                            from netmiko.scp_handler import SCPConn
-                        scp = SCPConn(conn)
-                        scp.scp_transfer_file(str(snippet_path), f"{fs}merge.cfg")
-                        scp.close()
-                        # apply the uploaded file
-                        out = conn.send_command(
-                            f"copy {fs}merge.cfg running-config",
-                            expect_string=r"\[yes/no\]|#",
+                        fs = _nx_pick_fs(
+                            conn,
+                            h,
+                            cli_dest_fs or default_fs(h.get("device_type")),
                         )
-                        if "[yes/no]" in out:
-                            out += "\n" + conn.send_command("yes", expect_string=r"#")
+                        # verify FS (best effort)
+                        _ = conn.send_command(f"dir {fs}", expect_string=r"#")
+                        # raw SCP (no free-space parsing)
+                        try:
+                            try:
+                                from netmiko import SCPConn
+                            except Exception:
+                                from netmiko.scp_handler import SCPConn
+                            scp = SCPConn(conn)
+                            scp.scp_transfer_file(str(snippet_path), f"{fs}merge.cfg")
+                            scp.close()
+                            # apply the uploaded file
+                            out = conn.send_command(
+                                f"copy {fs}merge.cfg running-config",
+                                expect_string=r"\[yes/no\]|#",
+                            )
+                            if "[yes/no]" in out:
+                                out += "\n" + conn.send_command(
+                                    "yes", expect_string=r"#"
+                                )
+                            print(out)
+                            scp_ok = True
+                        except Exception as scpe:
+                            print(f"⚠ SCP failed on {name}: {scpe}")
+                    except Exception as pre:
+                        print(f"⚠ NX FS probe failed on {name}: {pre}")
+
+                    if not scp_ok:
+                        print(f"→ Fallback to direct CLI push on {name}")
+                        out = conn.send_config_set(cmds, exit_config_mode=False)
                         print(out)
-                        scp_ok = True
-                    except Exception as scpe:
-                        print(f"⚠ SCP failed on {name}: {scpe}")
-                except Exception as pre:
-                    print(f"⚠ NX FS probe failed on {name}: {pre}")
-
-                if not scp_ok:
-                    print(f"→ Fallback to direct CLI push on {name}")
-                    out = conn.send_config_set(cmds, exit_config_mode=False)
-                    print(out)
-                    try:
-                        conn.exit_config_mode()
-                    except Exception:
-                        pass
-
-            else:
-                # IOS / IOS-XE: just push lines
-                out = conn.send_config_set(cmds)
-                print(out)
+                        try:
+                            conn.exit_config_mode()
+                        except Exception:
+                            pass
 
-            if commit:
-                save = conn.send_command(
-                    "copy running-config startup-config", expect_string=r"\[yes/no\]|#"
-                )
-                if "[yes/no]" in save:
-                    save += "\n" + conn.send_command("yes", expect_string=r"#")
-                print(save)
+                else:
+                    # IOS / IOS-XE: just push lines
+                    out = conn.send_config_set(cmds)
+                    print(out)
 
-            conn.disconnect()
+                if commit:
+                    save = conn.send_command(
+                        "copy running-config startup-config",
+                        expect_string=r"\[yes/no\]|#",
+                    )
+                    if "[yes/no]" in save:
+                        save += "\n" + conn.send_command("yes", expect_string=r"#")
+                    print(save)
 
         except Exception as e:
             print(f"ERROR {name}: {type(e).__name__}: {e}")
@@ -309,9 +215,16 @@ def _prompt_groups(groups):
     for idx, g in enumerate(groups, 1):
         print(f"  {idx}. {g}")
     print("Choose groups (comma-separated), or press Enter for ALL:")
-    resp = input("> ").strip()
+    # plain readline: no input() readline-hook setup / teardown
+    sys.stdout.write("> ")
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:  # Ctrl-D / closed stdin: abort like input() did, not ALL
+        raise EOFError
+    resp = line.strip()
     if not resp:
         return []
+    group_set = set(groups)
     selected = set()
     for token in resp.split(","):
         token = token.strip()
@@ -322,7 +235,7 @@ def _prompt_groups(groups):
             if 1 <= i <= len(groups):
                 selected.add(groups[i - 1])
         else:
-            if token in groups:
+            if token in group_set:
                 selected.add(token)
     return sorted(selected, key=lambda x: x.lower())
 
@@ -377,9 +290,7 @@ def main():
         sys.exit(f"Inventory load error: {e}")
 
     if args.print_hosts:
-        import json
-
-        print(json.dumps(hosts, indent=2))
+        print_json(hosts)
         return
 
     # interactive group selection if none provided and TTY
@@ -394,21 +305,23 @@ def main():
         args.group = chosen  # [] means ALL
 
     # filter
-    needles = [s.lower() for s in (args.only or [])]
-    skippers = [s.lower() for s in (args.skip or [])]
-    groupsel = [s.lower() for s in (args.group or [])]
+    needles = tuple(s.lower() for s in (args.only or []))
+    skippers = tuple(s.lower() for s in (args.skip or []))
+    groupsel = {s.lower() for s in (args.group or [])}
 
     selected = []
     for h in hosts:
         name = (h.get("name") or h.get("host") or "").strip()
         lname = name.lower()
-        host_groups = [gg.lower() for gg in (h.get("groups") or [])]
         if skippers and any(p in lname for p in skippers):
             print(f"⏭ Skipping {name}")
             continue
         if needles and not any(p in lname for p in needles):
             continue
-        if groupsel and not any(g in host_groups for g in groupsel):
+        # host groups lowered only when --group is used
+        if groupsel and groupsel.isdisjoint(
+            gg.lower() for gg in (h.get("groups") or ())
+        ):
             continue
         selected.append(h)
 
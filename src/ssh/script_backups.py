@@ -2,10 +2,11 @@ import argparse
 import time
 import pathlib
 import os
-import yaml
 import re
-from dotenv import load_dotenv
-from netmiko import ConnectHandler
+from inventory_core import load_host_cfgs
+
+_INLINE_COMMENT = re.compile(r"\s+#.*$")  # "show ver  # commentaire"
+_SKIP = re.compile(r"^\s*(?:[!#].*)?$")  # ligne vide, "! ..." ou "# ..."
 
 
 def today():
@@ -21,87 +22,57 @@ def parse_args():
     return p.parse_args()
 
 
-def env_interp(v):
-    if isinstance(v, str) and v.startswith("${") and v.endswith("}"):
-        return os.getenv(v[2:-1], "")
-    return v
-
-
-def load_inventory(path):
-    load_dotenv()  # lit .env
-    with open(path) as f:
-        data = yaml.safe_load(f) or {}
-    defaults = {k: env_interp(v) for k, v in (data.get("defaults") or {}).items()}
-    hosts = []
-    for name, h in (data.get("hosts") or {}).items():
-        h = {k: env_interp(v) for k, v in (h or {}).items()}
-        cfg = dict(defaults)
-        cfg.update(h)  # defaults < host
-        host_cfg = {
-            "name": name,
-            "host": cfg["host"],
-            "device_type": cfg.get("device_type"),
-            "username": cfg.get("username"),
-            "password": cfg.get("password"),
-            "secret": cfg.get("secret"),
-            "fast_cli": bool(cfg.get("fast_cli", True)),
-            "port": int(cfg.get("port", 22)),
-            "groups": cfg.get("groups", []),
-        }
-        hosts.append(host_cfg)
-    return hosts
-
-
 def load_commands(path):
-    cmds = []
-    with open(path, encoding="utf-8") as f:
-        for raw in f:
-            line = raw.rstrip("\r\n")  # normalise fin de ligne
-            line = re.sub(r"\s+#.*$", "", line)  # enlève commentaire inline
-            line = line.strip()
-            if not line:  # skip vides / comment-only
-                continue
-            cmds.append(line)
-    return cmds
+    # skip lignes vides / comment-only, puis enlève les commentaires inline
+    # un seul read() + splitlines() en C plutôt qu'une itération ligne à ligne
+    lines = pathlib.Path(path).read_text(encoding="utf-8").splitlines()
+    # la plupart des lignes n'ont pas de "#": pas de regex pour celles-là
+    return [
+        (_INLINE_COMMENT.sub("", line) if "#" in line else line).strip()
+        for line in lines
+        if not _SKIP.match(line)
+    ]
 
 
 def _select_creds(host_cfg):
     """Choisit user/pass selon groups + variables d'env. Fallback = valeurs host_cfg."""
-    groups = host_cfg.get("groups") or []
+    groups = host_cfg.groups
     if "nex" in groups:
-        user = os.getenv("SSH_NEX_USERNAME") or host_cfg.get("username")
-        pwd = os.getenv("SSH_NEX_PASSWORD") or host_cfg.get("password")
+        user = os.getenv("SSH_NEX_USERNAME") or host_cfg.username
+        pwd = os.getenv("SSH_NEX_PASSWORD") or host_cfg.password
         # force device_type si absent
-        if not host_cfg.get("device_type"):
-            host_cfg["device_type"] = "cisco_nxos"
+        if not host_cfg.device_type:
+            host_cfg.device_type = "cisco_nxos"
     else:
-        user = os.getenv("SSH_USERNAME") or host_cfg.get("username")
-        pwd = os.getenv("SSH_PASSWORD") or host_cfg.get("password")
+        user = os.getenv("SSH_USERNAME") or host_cfg.username
+        pwd = os.getenv("SSH_PASSWORD") or host_cfg.password
     return user, pwd
 
 
 def run_commands_on_host(host_cfg, commands):
     """
-    host_cfg: dict avec host, device_type, username, password, secret, fast_cli, port
+    host_cfg: HostCfg (host, device_type, username, password, secret, fast_cli, port)
     commands: list[str]
     return: dict {cmd: output} (+ "__error__" si échec)
     """
     results = {}
     user, pwd = _select_creds(host_cfg)
     dev = {
-        "device_type": host_cfg["device_type"],
-        "host": host_cfg["host"],
+        "device_type": host_cfg.device_type,
+        "host": host_cfg.host,
         "username": user,
         "password": pwd,
-        "fast_cli": host_cfg["fast_cli"],
-        "port": host_cfg["port"],
+        "fast_cli": host_cfg.fast_cli,
+        "port": host_cfg.port,
     }
-    if host_cfg.get("secret"):
-        dev["secret"] = host_cfg["secret"]
+    if host_cfg.secret:
+        dev["secret"] = host_cfg.secret
+
+    from netmiko import ConnectHandler  # import lourd, seulement si connexion
 
     try:
         with ConnectHandler(**dev) as conn:
-            if host_cfg.get("secret"):
+            if host_cfg.secret:
                 conn.enable()
             for cmd in commands:
                 out = conn.send_command(cmd)
@@ -142,12 +113,12 @@ def main():
     batch_dir.mkdir(parents=True, exist_ok=True)
     # (on remplira ici)
     print(f"Create folder for the backups : {batch_dir}")
-    hosts = load_inventory(args.inventory)
-    print("Inventaire:", [h["name"] for h in hosts])
+    hosts = load_host_cfgs(args.inventory)
+    print("Inventaire:", [h.name for h in hosts])
     for h in hosts:
-        print(f"===> {h['name']} ({h['host']})")
+        print(f"===> {h.name} ({h.host})")
         results = run_commands_on_host(h, ["show running-config"])
-        save_results(batch_dir, h["name"], results, args.save_raw)
+        save_results(batch_dir, h.name, results, args.save_raw)
 
     print(f"✔ Done. Result exported in {batch_dir}")
 
@@ -4,106 +4,42 @@ import argparse
 import pathlib
 import sys
 import os
-import copy
-import yaml
-from typing import Any, Dict, List
-from netmiko import ConnectHandler  # file_transfer kept for IOS path
-
-# optional .env support (for ${SSH_*} in YAML)
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-except Exception:
-    pass
+import re
+import functools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+from _ssh_pool import borrow, throttle_connect
+from inventory_core import (
+    _to_bool,
+    default_fs,
+    load_inventory as _load_inventory,
+    netmiko_driver,
+    print_json,
+)
+
+# single-pass scans of device output / error text
+_NX_DIR_BAD = re.compile(r"No such file or directory|Error|Invalid|not found")
+_SCP_DISABLED = re.compile(
+    r"scp file transfers are not enabled|ip scp server enable|feature scp-server",
+    re.I,
+)
+# snippet cleanup: whole-file passes on the raw bytes instead of per-line checks
+_SNIPPET_COMMENT = re.compile(rb"^[ \t]*[!#].*$", re.M)
+# "- cmd" loses "- " only (deeper indents survive); "-cmd" / "-\tcmd" -> "cmd"
+_SNIPPET_BULLET = re.compile(rb"^[ \t]*-(?: |(?!-)[ \t]*)", re.M)
+
+
+# IOS snippets at least this long go through SCP + copy instead of
+# send_config_set (inventory scp_push: true/false overrides)
+_SCP_MIN_LINES = 200
 
 
 # ------------------------------
 # Inventory helpers
 # ------------------------------
-def _expand_env_val(v: Any) -> Any:
-    if isinstance(v, str) and v.startswith("${") and v.endswith("}"):
-        return os.getenv(v[2:-1], "")
-    return v
-
-
-def _deep_expand_env(x: Any) -> Any:
-    if isinstance(x, dict):
-        return {k: _deep_expand_env(v) for k, v in x.items()}
-    if isinstance(x, list):
-        return [_deep_expand_env(v) for v in x]
-    return _expand_env_val(x)
-
-
-def _merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
-    out = copy.deepcopy(a) if a else {}
-    for k, v in (b or {}).items():
-        out[k] = v
-    return out
-
-
-def _to_bool(val: Any) -> Any:
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, str):
-        return val.strip().lower() in ("1", "true", "yes", "on")
-    return val
-
-
-def _materialize_host(
-    name: str, cfg: Dict[str, Any], defaults: Dict[str, Any], groups_def: Dict[str, Any]
-) -> Dict[str, Any]:
-    """
-    defaults -> groups -> host, then expand ${ENV}, and coerce types.
-    NOTE: dest_file_system can be set in YAML; otherwise we'll auto-pick later.
-    """
-    base = copy.deepcopy(defaults or {})
-    for g in cfg.get("groups") or []:
-        if groups_def and g in groups_def:
-            base = _merge(base, groups_def[g])
-    base = _merge(base, cfg or {})
-    base["name"] = name
-
-    base = _deep_expand_env(base)
-
-    if "fast_cli" in base:
-        base["fast_cli"] = _to_bool(base["fast_cli"])
-    if "port" in base:
-        try:
-            base["port"] = int(base["port"])
-        except Exception:
-            pass
-    if "use_scp" in base:
-        base["use_scp"] = _to_bool(base["use_scp"])
-
-    return base
-
-
 def load_inventory(path: str | None = None) -> List[Dict[str, Any]]:
-    inv_file = pathlib.Path(path or "inventory.yaml")
-    if not inv_file.exists():
-        raise FileNotFoundError(f"Inventaire non trouvé: {inv_file}")
-
-    data = yaml.safe_load(inv_file.read_text()) or {}
-
-    # Nornir-style {defaults, groups, hosts: {name: cfg}}
-    if isinstance(data, dict) and "hosts" in data and isinstance(data["hosts"], dict):
-        defaults = data.get("defaults", {}) or {}
-        groups_def = data.get("groups", {}) or {}
-        out = []
-        for name, cfg in data["hosts"].items():
-            out.append(_materialize_host(name, cfg or {}, defaults, groups_def))
-        return out
-
-    # Simple formats
-    if isinstance(data, dict) and isinstance(data.get("hosts"), list):
-        return data["hosts"]
-    if isinstance(data, list):
-        return data
-
-    raise ValueError(
-        "inventory.yaml invalide: attendu Nornir-style ou une liste d'hôtes."
-    )
+    return _load_inventory(path or "inventory.yaml")
 
 
 # ------------------------------
@@ -112,13 +48,13 @@ def load_inventory(path: str | None = None) -> List[Dict[str, Any]]:
 def select_creds(h: Dict[str, Any]):
     user = (h.get("username") or "").strip()
     pwd = (h.get("password") or "").strip()
-    devt = (h.get("device_type") or "").lower()
+    platform = _platform(h)
 
     if not user or not pwd:
-        if "nx" in devt:
+        if platform == "cisco_nxos":
             user = user or os.getenv("SSH_NEX_USERNAME", "")
             pwd = pwd or os.getenv("SSH_NEX_PASSWORD", "")
-        elif "xr" in devt:
+        elif platform == "cisco_xr":
             user = user or os.getenv("SSH_XR_USERNAME", "")
             pwd = pwd or os.getenv("SSH_XR_PASSWORD", "")
         else:
@@ -133,31 +69,13 @@ def select_creds(h: Dict[str, Any]):
     return user, pwd
 
 
-def _napalm_driver(devtype: str | None) -> str:
-    dt = (devtype or "cisco_ios").lower()
-    if "xr" in dt:
-        return "iosxr"
-    if "nx" in dt:
-        return "nxos_ssh"  # SSH transport for Nexus
-    return "ios"
+# NAPALM driver per Netmiko platform (SSH transport for Nexus)
+_NAPALM_SSH = {"cisco_ios": "ios", "cisco_nxos": "nxos_ssh", "cisco_xr": "iosxr"}
 
 
-def _netmiko_driver(devtype: str | None) -> str:
-    dt = (devtype or "cisco_ios").lower()
-    if "xr" in dt:
-        return "cisco_xr"
-    if "nx" in dt:
-        return "cisco_nxos"
-    return "cisco_ios"
-
-
-def _default_fs_for(devtype: str | None) -> str | None:
-    dt = (devtype or "").lower()
-    if "nx" in dt:
-        return "bootflash:"
-    if "xr" in dt:
-        return "disk0:"
-    return "flash:"  # IOS/IOS-XE
+def _platform(h: Dict[str, Any]) -> str:
+    """Netmiko driver of the host (shared exact-match table in inventory_core)."""
+    return netmiko_driver(h.get("device_type"))
 
 
 # ------------------------------
@@ -167,13 +85,11 @@ def connect_napalm(h: Dict[str, Any], cli_dest_fs: str | None = None):
     from napalm import get_network_driver
 
     user, pwd = select_creds(h)
-    driver = _napalm_driver(h.get("device_type"))
+    driver = _NAPALM_SSH[_platform(h)]
     drv = get_network_driver(driver)
 
     dest_fs = (
-        h.get("dest_file_system")
-        or cli_dest_fs
-        or _default_fs_for(h.get("device_type"))
+        h.get("dest_file_system") or cli_dest_fs or default_fs(h.get("device_type"))
     )
 
     optional = {}
@@ -195,84 +111,107 @@ def connect_napalm(h: Dict[str, Any], cli_dest_fs: str | None = None):
         optional_args=optional,
         timeout=90,
     )
+    throttle_connect()  # parallel hosts share the handshake pacing
     dev.open()
     return dev
 
 
 def _is_scp_disabled_error(e: Exception) -> bool:
-    s = str(e).lower()
-    return (
-        "scp file transfers are not enabled" in s
-        or "ip scp server enable" in s
-        or "feature scp-server" in s
-    )
+    return _SCP_DISABLED.search(str(e)) is not None
 
 
-def _normalize_snippet_text(snippet_path: pathlib.Path) -> str:
-    lines_out = []
-    for raw in snippet_path.read_text().splitlines():
-        s = raw.rstrip()
-        if not s or s.lstrip().startswith(("!", "#")):
-            continue
-        # Handle YAML bullets turning into '- <cmd>'
-        if s.lstrip().startswith("- "):
-            s = s.lstrip()[2:]  # drop "- "
-        elif s.lstrip().startswith("-") and not s.lstrip().startswith("--"):
-            # handles cases like "-no shutdown" -> "no shutdown"
-            s = s.lstrip()[1:].lstrip()
-        lines_out.append(s)
+@functools.lru_cache(maxsize=8)
+def _normalize_snippet_text(snippet_path: str) -> str:
+    """Snippet text cleaned for NAPALM; cached per resolved path (one read per run)."""
+    raw = _SNIPPET_COMMENT.sub(b"", pathlib.Path(snippet_path).read_bytes())
+    # Handle YAML bullets turning into '- <cmd>' / '-no shutdown' (not '--')
+    raw = _SNIPPET_BULLET.sub(b"", raw)
+    lines_out = [line.rstrip() for line in raw.decode("utf-8").splitlines()]
+    lines_out = [line for line in lines_out if line]
     return "\n".join(lines_out) + "\n"
 
 
+def _merge_one(
+    h: Dict[str, Any],
+    cfg_text: str,
+    snippet_path: pathlib.Path,
+    commit: bool,
+    cli_dest_fs: str | None,
+) -> List[str]:
+    """NAPALM merge on one host; returns its log lines (printed by the caller)."""
+    name = h.get("name") or h.get("host")
+    log = [f"\n===> Merge on {name} ({h.get('host')}) groups={h.get('groups')}"]
+    try:
+        dev = connect_napalm(h, cli_dest_fs=cli_dest_fs)
+        # IMPORTANT: feed config text directly (avoid filename path issues)
+        dev.load_merge_candidate(config=cfg_text)
+        diff = (dev.compare_config() or "").strip()
+        if not diff:
+            log.append("No change, discard.")
+            dev.discard_config()
+        else:
+            log.append(f"DIFF:\n {diff}")
+            if commit:
+                dev.commit_config()
+                log.append("✔ committed")
+            else:
+                dev.discard_config()
+                log.append("ℹ discarded (use --commit to apply)")
+        dev.close()
+    except Exception as e:
+        # same fallback you already had
+        if _is_scp_disabled_error(e):
+            if not commit:
+                log.append(
+                    f"⚠ SCP disabled on {name}. Dry-run requested → skipping"
+                    " fallback to avoid changing running-config."
+                )
+                return log
+            log.append(
+                f"⚠ SCP disabled on {name}. Falling back to Netmiko"
+                " (send_config_set / NX SCP)."
+            )
+            try:
+                log += _push_one(h, snippet_path, commit=True, cli_dest_fs=cli_dest_fs)
+            except Exception as ee:
+                log.append(f"ERROR {name} (fallback): {type(ee).__name__}: {ee}")
+        else:
+            log.append(f"ERROR {name}: {type(e).__name__}: {e}")
+    return log
+
+
+def _run_parallel(fn, hosts: List[Dict[str, Any]], workers: int) -> None:
+    """Run fn(h) for every host in a thread pool; each host's log prints as one block."""
+    if not hosts:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as ex:
+        futures = [ex.submit(fn, h) for h in hosts]
+        # printing on this thread only: no interleaving between hosts
+        for fut in as_completed(futures):
+            print("\n".join(fut.result()))
+
+
 def napalm_merge(
     hosts: List[Dict[str, Any]],
     snippet_path: pathlib.Path,
     commit: bool,
     cli_dest_fs: str | None,
+    workers: int = 8,
 ):
     if not snippet_path or not snippet_path.exists():
         raise FileNotFoundError(f"Snippet not found: {snippet_path.resolve()}")
-    cfg_text = _normalize_snippet_text(snippet_path)
-
-    for h in hosts:
-        name = h.get("name") or h.get("host")
-        print(f"\n===> Merge on {name} ({h.get('host')}) groups={h.get('groups')}")
-        try:
-            dev = connect_napalm(h, cli_dest_fs=cli_dest_fs)
-            # IMPORTANT: feed config text directly (avoid filename path issues)
-            cfg_text = pathlib.Path("snippet.cfg").read_text()
-            dev.load_merge_candidate(config=cfg_text)
-            diff = (dev.compare_config() or "").strip()
-            if not diff:
-                print("No change, discard.")
-                dev.discard_config()
-            else:
-                print("DIFF:\n", diff)
-                if commit:
-                    dev.commit_config()
-                    print("✔ committed")
-                else:
-                    dev.discard_config()
-                    print("ℹ discarded (use --commit to apply)")
-            dev.close()
-        except Exception as e:
-            # same fallback you already had
-            if _is_scp_disabled_error(e):
-                print(f"⚠ SCP disabled on {name}.", end=" ")
-                if not commit:
-                    print(
-                        "Dry-run requested → skipping fallback to avoid changing running-config."
-                    )
-                    continue
-                print("Falling back to Netmiko (send_config_set / NX SCP).")
-                try:
-                    netmiko_push(
-                        [h], snippet_path, commit=True, cli_dest_fs=cli_dest_fs
-                    )
-                except Exception as ee:
-                    print(f"ERROR {name} (fallback): {type(ee).__name__}: {ee}")
-            else:
-                print(f"ERROR {name}: {type(e).__name__}: {e}")
+    cfg_text = _normalize_snippet_text(str(snippet_path.resolve()))
+    _run_parallel(
+        functools.partial(
+            _merge_one,
+            cfg_text=cfg_text,
+            snippet_path=snippet_path,
+            commit=commit,
+            cli_dest_fs=cli_dest_fs,
+        ),
+        hosts,
+        workers,
+    )
 
 
 # ------------------------------
@@ -283,24 +222,26 @@ def _nx_try_dir(conn, fs: str) -> bool:
     out = conn.send_command(
         f"dir {fs}", expect_string=r"#", strip_prompt=False, strip_command=False
     )
-    bad = ("No such file or directory", "Error", "Invalid", "not found")
-    return not any(b in out for b in bad)
+    return _NX_DIR_BAD.search(out) is None
 
 
 def _nx_pick_fs(conn, h: Dict[str, Any], cli_dest_fs: str | None) -> str:
     """Pick a working filesystem for NX-OS without relying on Netmiko free-space parsing."""
-    candidates = []
-    if cli_dest_fs:
-        candidates.append(cli_dest_fs)
-    if h.get("dest_file_system"):
-        candidates.append(h["dest_file_system"])
-    # common on NX-OS/labs
-    candidates += ["bootflash:", "flash:", "volatile:", "logflash:"]
-    tried = []
+    # CLI override, inventory, then the usual NX-OS/lab filesystems;
+    # dict.fromkeys de-duplicates while keeping that order
+    candidates = dict.fromkeys(
+        fs
+        for fs in (
+            cli_dest_fs,
+            h.get("dest_file_system"),
+            "bootflash:",
+            "flash:",
+            "volatile:",
+            "logflash:",
+        )
+        if fs
+    )
     for fs in candidates:
-        if fs in tried:
-            continue
-        tried.append(fs)
         try:
             if _nx_try_dir(conn, fs):
                 return fs
@@ -308,16 +249,16 @@ def _nx_pick_fs(conn, h: Dict[str, Any], cli_dest_fs: str | None) -> str:
             pass
     raise RuntimeError(
         f"Could not find a working filesystem on {h.get('name') or h.get('host')}. "
-        f"Tried: {', '.join(tried)}. Override with --dest-fs or inventory.dest_file_system."
+        f"Tried: {', '.join(candidates)}. Override with --dest-fs or inventory.dest_file_system."
     )
 
 
 # ------------------------------
 # Netmiko path (direct push)
 # ------------------------------
-def connect_netmiko(h: Dict[str, Any]):
+def _netmiko_params(h: Dict[str, Any]) -> Dict[str, Any]:
     user, pwd = select_creds(h)
-    device_type = _netmiko_driver(h.get("device_type"))
+    device_type = _platform(h)
 
     params = {
         "device_type": device_type,
@@ -331,101 +272,160 @@ def connect_netmiko(h: Dict[str, Any]):
         params["secret"] = h["secret"]  # enable secret (IOS/IOS-XE)
 
     # DO NOT pass dest_file_system here (would break BaseConnection.__init__)
-    return ConnectHandler(**params)
+    return params
 
 
-def _load_snippet_lines(snippet_path: pathlib.Path) -> List[str]:
-    lines = []
-    for raw in snippet_path.read_text().splitlines():
-        s = raw.strip()
-        if not s or s.startswith("!") or s.startswith("#"):
-            continue
-        lines.append(s)
-    return lines
+@functools.lru_cache(maxsize=8)
+def _load_snippet_lines(snippet_path: str) -> Tuple[str, ...]:
+    """Config lines of the snippet; cached per resolved path (one read per run)."""
+    raw = _SNIPPET_COMMENT.sub(b"", pathlib.Path(snippet_path).read_bytes())
+    lines = (line.strip() for line in raw.decode("utf-8").splitlines())
+    return tuple(line for line in lines if line)
 
 
-def _nx_dest_fs(h: Dict[str, Any], cli_dest_fs: str | None) -> str:
+def _dest_fs(h: Dict[str, Any], cli_dest_fs: str | None) -> str:
     # CLI override > inventory > default
     return (
         cli_dest_fs
         or h.get("dest_file_system")
-        or _default_fs_for(h.get("device_type"))
+        or default_fs(h.get("device_type"))
         or "bootflash:"
     )
 
 
-def netmiko_push(
-    hosts: List[Dict[str, Any]],
+def _scp_upload(conn, local_path: str, dest: str, name: str) -> None:
+    """SCP local_path to dest (e.g. "bootflash:merge.cfg").
+
+    SCPConn opens its own SSH connection next to conn, so it goes through
+    the same handshake pacing as every other connect.
+    """
+    try:
+        try:
+            from netmiko import SCPConn
+        except Exception:
+            from netmiko.scp_handler import SCPConn  # older netmiko
+        throttle_connect()
+        scp = SCPConn(conn)
+        try:
+            scp.scp_transfer_file(local_path, dest)
+        finally:
+            scp.close()
+    except Exception as scpe:
+        raise RuntimeError(f"SCP failed on {name} to {dest}: {scpe}") from scpe
+
+
+def _delete_file(conn, path: str, platform: str, log: List[str]) -> None:
+    """Remove an uploaded file without the confirmation prompts; failures are logged."""
+    cmd = (
+        f"delete {path} no-prompt"
+        if platform == "cisco_nxos"
+        else f"delete /force {path}"
+    )
+    try:
+        conn.send_command(cmd, expect_string=r"#")
+    except Exception as e:
+        log.append(f"⚠ could not delete {path}: {type(e).__name__}: {e}")
+
+
+def _copy_to_running(conn, src: str) -> str:
+    """Apply an uploaded file with 'copy <src> running-config' (single round-trip)."""
+    out = conn.send_command(
+        f"copy {src} running-config",
+        expect_string=r"\[yes/no\]|\]\?|#",
+    )
+    if "[yes/no]" in out:  # NX-OS
+        out += "\n" + conn.send_command("yes", expect_string=r"#")
+    elif out.rstrip().endswith("]?"):  # IOS: "Destination filename [running-config]?"
+        out += "\n" + conn.send_command("", expect_string=r"#")
+    return out
+
+
+def _push_one(
+    h: Dict[str, Any],
     snippet_path: pathlib.Path,
     commit: bool,
     cli_dest_fs: str | None = None,
-):
-    cmds = _load_snippet_lines(snippet_path)
-    for h in hosts:
-        name = h.get("name") or h.get("host")
-        devt = (h.get("device_type") or "").lower()
-        print(
-            f"\n===> Netmiko push on {name} ({h.get('host')}) groups={h.get('groups')}"
-        )
+) -> List[str]:
+    """Netmiko push on one host; returns its log lines (printed by the caller)."""
+    cmds = _load_snippet_lines(str(snippet_path.resolve()))
+    name = h.get("name") or h.get("host")
+    platform = _platform(h)
+    log = [f"\n===> Netmiko push on {name} ({h.get('host')}) groups={h.get('groups')}"]
 
-        if "xr" in devt:
-            print(f"⏭ Skipping {name} (IOS-XR not supported in this Netmiko mode)")
-            continue
+    if platform == "cisco_xr":
+        log.append(f"⏭ Skipping {name} (IOS-XR not supported in this Netmiko mode)")
+        return log
 
-        try:
-            conn = connect_netmiko(h)
+    try:
+        with borrow(_netmiko_params(h)) as conn:
 
-            if "nx" in devt:
+            if platform == "cisco_nxos":
                 # --- NX-OS: ALWAYS use raw SCPConn (avoid Netmiko file_transfer free-space parse) ---
                 _ = conn.send_command("terminal length 0", expect_string=r"#")
                 fs = _nx_pick_fs(conn, h, cli_dest_fs)
-
-                # Push file via SCP over the current SSH session
-                try:
-                    try:
-                        from netmiko import SCPConn
-                    except Exception:
-                        from netmiko.scp_handler import SCPConn  # older netmiko
-                    scp = SCPConn(conn)
-                    scp.scp_transfer_file(str(snippet_path), f"{fs}merge.cfg")
-                    scp.close()
-                except Exception as scpe:
-                    raise RuntimeError(
-                        f"SCP failed on {name} to {fs}merge.cfg: {scpe}"
-                    ) from scpe
-
+                _scp_upload(conn, str(snippet_path), f"{fs}merge.cfg", name)
                 # (optional) verify presence
                 _ = conn.send_command(f"dir {fs} | i merge.cfg", expect_string=r"#")
-
-                # Apply the uploaded file
-                out = conn.send_command(
-                    f"copy {fs}merge.cfg running-config", expect_string=r"\[yes/no\]|#"
-                )
-                if "[yes/no]" in out:
-                    out += "\n" + conn.send_command("yes", expect_string=r"#")
-                print(out)
+                log.append(_copy_to_running(conn, f"{fs}merge.cfg"))
+                # only after a good copy: a failed one may leave the session busy
+                _delete_file(conn, f"{fs}merge.cfg", platform, log)
 
             else:
-                # --- IOS / IOS-XE: push lines directly ---
-                out = conn.send_config_set(cmds)
-                print(out)
+                # --- IOS / IOS-XE: lines directly; one SCP upload + one copy
+                # only for large snippets (or inventory scp_push: true), where
+                # it beats a round-trip per line ---
+                scp_push = h.get("scp_push")
+                if scp_push is None:
+                    scp_push = len(cmds) >= _SCP_MIN_LINES
+                if not _to_bool(scp_push):
+                    log.append(conn.send_config_set(cmds))
+                else:
+                    fs = _dest_fs(h, cli_dest_fs)
+                    try:
+                        with tempfile.TemporaryDirectory() as tmp:
+                            # upload the cleaned lines, as send_config_set would send them
+                            local = pathlib.Path(tmp, "merge.cfg")
+                            local.write_text("\n".join(cmds) + "\n", encoding="utf-8")
+                            _scp_upload(conn, str(local), f"{fs}merge.cfg", name)
+                    except RuntimeError as e:
+                        reason = "SCP disabled" if _is_scp_disabled_error(e) else str(e)
+                        log.append(f"⚠ {reason} → falling back to send_config_set")
+                        log.append(conn.send_config_set(cmds))
+                    else:
+                        log.append(_copy_to_running(conn, f"{fs}merge.cfg"))
+                        _delete_file(conn, f"{fs}merge.cfg", platform, log)
 
             if commit:
-                if "nx" in devt:
+                if platform == "cisco_nxos":
                     save = conn.send_command(
                         "copy running-config startup-config",
                         expect_string=r"\[yes/no\]|#",
                     )
                     if "[yes/no]" in save:
                         save += "\n" + conn.send_command("yes", expect_string=r"#")
-                    print(save)
+                    log.append(save)
                 else:
-                    print(conn.save_config())
+                    log.append(conn.save_config())
 
-            conn.disconnect()
+    except Exception as e:
+        log.append(f"ERROR {name}: {type(e).__name__}: {e}")
+    return log
 
-        except Exception as e:
-            print(f"ERROR {name}: {type(e).__name__}: {e}")
+
+def netmiko_push(
+    hosts: List[Dict[str, Any]],
+    snippet_path: pathlib.Path,
+    commit: bool,
+    cli_dest_fs: str | None = None,
+    workers: int = 8,
+):
+    _run_parallel(
+        functools.partial(
+            _push_one, snippet_path=snippet_path, commit=commit, cli_dest_fs=cli_dest_fs
+        ),
+        hosts,
+        workers,
+    )
 
 
 # ------------------------------
@@ -447,9 +447,16 @@ def _prompt_groups(groups):
     for idx, g in enumerate(groups, 1):
         print(f"  {idx}. {g}")
     print("Choose groups (comma-separated), or press Enter for ALL:")
-    resp = input("> ").strip()
+    # plain readline: no input() readline-hook setup / teardown
+    sys.stdout.write("> ")
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:  # Ctrl-D / closed stdin: abort like input() did, not ALL
+        raise EOFError
+    resp = line.strip()
     if not resp:
         return []
+    group_set = set(groups)
     selected = set()
     for token in resp.split(","):
         token = token.strip()
@@ -460,7 +467,7 @@ def _prompt_groups(groups):
             if 1 <= i <= len(groups):
                 selected.add(groups[i - 1])
         else:
-            if token in groups:
+            if token in group_set:
                 selected.add(token)
     return sorted(selected, key=lambda x: x.lower())
 
@@ -517,6 +524,12 @@ def main():
         "--dest-fs",
         help="Override remote filesystem (e.g., bootflash:, flash:, volatile:, logflash:)",
     )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of hosts configured in parallel (default 8)",
+    )
     args = ap.parse_args()
 
     # allow --print-hosts without --snippet
@@ -540,28 +553,27 @@ def main():
         args.group = chosen  # [] means ALL
 
     if args.print_hosts:
-        import json
-
-        print(json.dumps(hosts, indent=2))
+        print_json(hosts)
         return
 
     # filter
-    needles = [s.lower() for s in (args.only or [])]
-    skippers = [s.lower() for s in (args.skip or [])]
-    groupsel = [s.lower() for s in (args.group or [])]
+    needles = tuple(s.lower() for s in (args.only or []))
+    skippers = tuple(s.lower() for s in (args.skip or []))
+    groupsel = {s.lower() for s in (args.group or [])}
 
     selected = []
     for h in hosts:
         name = (h.get("name") or h.get("host") or "").strip()
         lname = name.lower()
-        host_groups = [gg.lower() for gg in (h.get("groups") or [])]
-
         if skippers and any(p in lname for p in skippers):
             print(f"⏭ Skipping {name}")
             continue
         if needles and not any(p in lname for p in needles):
             continue
-        if groupsel and not any(g in host_groups for g in groupsel):
+        # host groups lowered only when --group is used
+        if groupsel and groupsel.isdisjoint(
+            gg.lower() for gg in (h.get("groups") or ())
+        ):
             continue
 
         selected.append(h)
@@ -575,9 +587,13 @@ def main():
 
     # apply
     if args.engine == "napalm":
-        napalm_merge(selected, snip, args.commit, cli_dest_fs=args.dest_fs)
+        napalm_merge(
+            selected, snip, args.commit, cli_dest_fs=args.dest_fs, workers=args.workers
+        )
     else:
-        netmiko_push(selected, snip, args.commit, cli_dest_fs=args.dest_fs)
+        netmiko_push(
+            selected, snip, args.commit, cli_dest_fs=args.dest_fs, workers=args.workers
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+import os
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "ssh"))
+
+import inventory_cache  # noqa: E402
+import inventory_core  # noqa: E402
+
+INVENTORY = """
+defaults:
+  username: ${LAB_USER}
+  password: ${LAB_PASS}
+  device_type: cisco_ios
+  fast_cli: "false"
+
+groups:
+  nex:
+    username: ${LAB_NEX_USER}
+
+hosts:
+  r1:
+    host: 10.0.0.1
+    port: "2222"
+  sw1:
+    host: 10.0.0.2
+    device_type: cisco_nxos
+    groups: [nex]
+"""
+
+
+@pytest.fixture
+def inventory(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory_cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setenv("LAB_USER", "admin")
+    monkeypatch.setenv("LAB_PASS", "secret")
+    monkeypatch.setenv("LAB_NEX_USER", "nexadmin")
+    inventory_core._env.cache_clear()
+    inventory_core._load.cache_clear()
+    path = tmp_path / "inventory.yaml"
+    path.write_text(INVENTORY)
+    return path
+
+
+def test_materializes_defaults_groups_and_host(inventory):
+    r1, sw1 = inventory_core.load_inventory(str(inventory))
+
+    assert r1["name"] == "r1"
+    assert (r1["username"], r1["password"]) == ("admin", "secret")
+    assert r1["port"] == 2222
+    assert r1["fast_cli"] is False
+    assert r1["groups"] == []
+
+    assert sw1["username"] == "nexadmin"
+    assert sw1["device_type"] == "cisco_nxos"
+    assert sw1["port"] == 22
+
+
+def test_reloads_when_file_changes(inventory):
+    first = inventory_core.load_inventory(str(inventory))
+    first[0]["device_type"] = "mutated"
+    first[1]["groups"].append("mutated")
+    assert inventory_core.load_inventory(str(inventory))[0]["device_type"] == (
+        "cisco_ios"
+    )
+    assert inventory_core.load_inventory(str(inventory))[1]["groups"] == ["nex"]
+
+    inventory.write_text(INVENTORY.replace("10.0.0.1", "10.0.0.9"))
+    st = inventory.stat()
+    os.utime(inventory, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert inventory_core.load_inventory(str(inventory))[0]["host"] == "10.0.0.9"
+
+
+def test_napalm_driver():
+    assert inventory_core.napalm_driver("cisco_xr") == "iosxr"
+    assert inventory_core.napalm_driver("cisco_nxos") == "nxos"
+    assert inventory_core.napalm_driver(None) == "ios"
+
+
+def test_host_cfgs(inventory):
+    r1, sw1 = inventory_core.load_host_cfgs(str(inventory))
+    assert (r1.name, r1.host, r1.port, r1.fast_cli) == ("r1", "10.0.0.1", 2222, False)
+    assert sw1.groups == ("nex",)
+    assert not hasattr(r1, "__dict__")
+
+
+def test_yaml_cache_is_private(inventory):
+    inventory_cache.load_yaml(inventory)
+    (cache_file,) = inventory_cache.CACHE_DIR.iterdir()
+    assert inventory_cache.CACHE_DIR.stat().st_mode & 0o777 == 0o700
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+
+    cache_file.chmod(0o644)  # loose copy: not unpickled, rewritten private
+    assert not inventory_cache._trusted(cache_file)
+    assert inventory_cache.load_yaml(inventory)["hosts"]["r1"]["host"] == "10.0.0.1"
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+
+
+def test_netmiko_driver_is_exact_match():
+    assert inventory_core.netmiko_driver("nxos_ssh") == "cisco_nxos"
+    assert inventory_core.netmiko_driver("IOSXR") == "cisco_xr"
+    assert inventory_core.netmiko_driver("cisco_xr_telnet") == "cisco_xr"
+    assert inventory_core.default_fs("cisco_nxos") == "bootflash:"
+    assert inventory_core.default_fs(None) == "flash:"
+
+
+def test_unlisted_device_types_keep_substring_classification():
+    assert inventory_core.netmiko_driver("cisco_xr_serial") == "cisco_xr"
+    assert inventory_core.netmiko_driver("nxos_custom") == "cisco_nxos"
+    assert inventory_core.netmiko_driver("arista_eos") == "cisco_ios"
+    assert inventory_core.napalm_driver("cisco_xr_serial") == "iosxr"
+    assert inventory_core.default_fs("cisco_xr_serial") == "disk0:"
@@ -0,0 +1,141 @@
+import contextlib
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "ssh"))
+
+import Run_commandstxt  # noqa: E402
+from inventory_core import HostCfg  # noqa: E402
+
+PROMPT = "R1#"
+COMMANDS = ["show clock", "show version | i uptime"]
+
+
+class FakeConn:
+    """Replays a device session: echo + output of each command, then the prompt."""
+
+    RETURN = "\n"
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = []
+
+    def find_prompt(self):
+        return PROMPT
+
+    def write_channel(self, data):
+        self.written.append(data)
+
+    def read_until_pattern(self, pattern, read_timeout=10.0):
+        idx = self.stream.index(PROMPT) + len(PROMPT)
+        out, self.stream = self.stream[:idx], self.stream[idx:]
+        return out
+
+    def normalize_linefeeds(self, s):
+        return s.replace("\r\n", "\n")
+
+
+def _session(*outputs):
+    return "".join(f"{cmd}\r\n{out}\r\n{PROMPT}" for cmd, out in zip(COMMANDS, outputs))
+
+
+def test_pipelined_splits_on_prompt():
+    conn = FakeConn(_session("*10:00:00 UTC", "R1 uptime is 1 day"))
+
+    assert Run_commandstxt._run_pipelined(conn, COMMANDS) == {
+        "show clock": "*10:00:00 UTC",
+        "show version | i uptime": "R1 uptime is 1 day",
+    }
+    assert conn.written == ["show clock\nshow version | i uptime\n"]
+    assert conn.stream == ""  # reads stop at the last prompt, no idle wait
+
+
+def test_split_mismatch_falls_back():
+    raw = f"show clock\n*10:00:00 UTC\n{PROMPT}"  # second command missing
+    assert Run_commandstxt._split_pipelined(raw, PROMPT, COMMANDS) is None
+
+
+def test_write_raw_handles_short_writes(tmp_path, monkeypatch):
+    real_write = Run_commandstxt.os.write
+    # at most 3 bytes per call, like a partially full disk / pipe
+    monkeypatch.setattr(
+        Run_commandstxt.os, "write", lambda fd, b: real_write(fd, bytes(b[:3]))
+    )
+    path = tmp_path / "r1__show_clock.txt"
+    Run_commandstxt._write_raw(str(path), b"*10:00:00 UTC")
+    assert path.read_bytes() == b"*10:00:00 UTC"
+
+
+class FakeSSHClient:
+    """paramiko.SSHClient stand-in: connect() and open_session() outcomes preset."""
+
+    instances = []
+    connect_error = None
+    session_error = None
+
+    def __init__(self):
+        self.closed = False
+        FakeSSHClient.instances.append(self)
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, *args, **kwargs):
+        if self.connect_error:
+            raise self.connect_error
+
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        raise self.session_error
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def exec_host(monkeypatch):
+    import paramiko
+
+    FakeSSHClient.instances = []
+    monkeypatch.setattr(paramiko, "SSHClient", FakeSSHClient)
+    monkeypatch.setattr(Run_commandstxt, "throttle_connect", lambda: None)
+    borrowed = []
+
+    @contextlib.contextmanager
+    def fake_borrow(params, connect_slots=None):
+        borrowed.append(params)
+        raise RuntimeError("netmiko path")
+        yield
+
+    monkeypatch.setattr(Run_commandstxt, "borrow", fake_borrow)
+    return HostCfg(name="r1", host="10.0.0.1", username="u", password="p"), borrowed
+
+
+def test_exec_auth_failure_is_reported_not_retried(exec_host, monkeypatch):
+    import paramiko
+
+    host, borrowed = exec_host
+    monkeypatch.setattr(
+        FakeSSHClient, "connect_error", paramiko.AuthenticationException("bad auth")
+    )
+    results = Run_commandstxt.run_commands_on_host(host, COMMANDS, exec_channels=True)
+    assert results == {"__error__": "bad auth"}
+    assert borrowed == []  # no second login through Netmiko
+    assert FakeSSHClient.instances[0].closed
+
+
+def test_exec_refused_falls_back_to_netmiko(exec_host, monkeypatch):
+    import paramiko
+
+    host, borrowed = exec_host
+    monkeypatch.setattr(
+        FakeSSHClient, "session_error", paramiko.ChannelException(1, "refused")
+    )
+    results = Run_commandstxt.run_commands_on_host(host, COMMANDS, exec_channels=True)
+    assert len(borrowed) == 1
+    assert results == {"__error__": "netmiko path"}
+    assert FakeSSHClient.instances[0].closed
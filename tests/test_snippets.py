@@ -0,0 +1,52 @@
+import importlib.util
+import pathlib
+import sys
+
+SSH_DIR = pathlib.Path(__file__).resolve().parents[1] / "src" / "ssh"
+sys.path.insert(0, str(SSH_DIR))
+
+import netmiko_snippet  # noqa: E402
+
+_spec = importlib.util.spec_from_file_location(
+    "snippet_napalm_netmiko", SSH_DIR / "snippet-napalm-netmiko.py"
+)
+snippet_napalm_netmiko = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(snippet_napalm_netmiko)
+
+SNIPPET = """\
+! banner comment
+interface Loopback0
+-  description lab loopback
+- ip address 10.0.0.1 255.255.255.255
+-\tno shutdown
+- -literal dash
+--long-option
+   # indented comment
+
+"""
+
+
+def test_napalm_snippet_keeps_indent_after_bullet(tmp_path):
+    path = tmp_path / "snippet.cfg"
+    path.write_text(SNIPPET)
+    assert snippet_napalm_netmiko._normalize_snippet_text(str(path)) == (
+        "interface Loopback0\n"
+        " description lab loopback\n"  # only "- " is dropped
+        "ip address 10.0.0.1 255.255.255.255\n"
+        "no shutdown\n"
+        "-literal dash\n"
+        "--long-option\n"
+    )
+
+
+def test_netmiko_snippet_lines(tmp_path):
+    path = tmp_path / "snippet.cfg"
+    path.write_text(SNIPPET)
+    assert netmiko_snippet._normalize_snippet_lines(path) == [
+        "interface Loopback0",
+        " description lab loopback",  # as the baseline loop kept it
+        "ip address 10.0.0.1 255.255.255.255",
+        "no shutdown",
+        "-literal dash",
+        "--long-option",
+    ]
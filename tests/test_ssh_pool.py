@@ -0,0 +1,121 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "ssh"))
+
+import _ssh_pool  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.now += s
+
+
+class FakeHandler:
+    created = []
+
+    def __init__(self, **params):
+        self.params = params
+        self.alive = True
+        self.closed = False
+        self.prompts = 0
+        FakeHandler.created.append(self)
+
+    def is_alive(self):
+        return self.alive
+
+    def check_config_mode(self):
+        return False
+
+    def find_prompt(self):
+        self.prompts += 1
+        return "R1#"
+
+    def disconnect(self):
+        self.closed = True
+
+
+PARAMS = {"host": "10.0.0.1", "username": "u", "password": "p"}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    import netmiko
+
+    FakeHandler.created = []
+    monkeypatch.setattr(netmiko, "ConnectHandler", FakeHandler)
+    monkeypatch.setattr(_ssh_pool, "_ensure_keepalive", lambda: None)
+    monkeypatch.setattr(_ssh_pool, "_bucket", _ssh_pool.TokenBucket(0, 1))
+    yield
+    _ssh_pool.set_pooling(False)
+
+
+@pytest.fixture
+def pool(handler):
+    _ssh_pool.set_pooling(True)
+
+
+def test_token_bucket_burst_then_paced(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(_ssh_pool.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(_ssh_pool.time, "sleep", clock.sleep)
+
+    bucket = _ssh_pool.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.take()
+    assert clock.slept == []  # the burst goes through at once
+
+    bucket.take()
+    assert clock.slept == [pytest.approx(0.5)]  # then 1 / rate per token
+
+    _ssh_pool.TokenBucket(rate=0, burst=1).take()  # rate 0 = unlimited
+    assert len(clock.slept) == 1
+
+
+def test_borrow_closes_by_default(handler):
+    with _ssh_pool.borrow(PARAMS) as conn:
+        pass
+    assert conn.closed and conn.prompts == 0  # no health check on the way out
+    with _ssh_pool.borrow(PARAMS) as again:
+        pass
+    assert again is not conn
+
+
+def test_borrow_reuses_connection(pool):
+    with _ssh_pool.borrow(PARAMS) as first:
+        pass
+    with _ssh_pool.borrow(PARAMS) as second:
+        pass
+    assert first is second
+    assert len(FakeHandler.created) == 1
+
+    with _ssh_pool.borrow(dict(PARAMS, password="other")) as third:
+        pass
+    assert third is not first  # secrets are part of the pool key
+
+
+def test_borrow_drops_dead_or_failed_connections(pool):
+    with _ssh_pool.borrow(PARAMS) as conn:
+        pass
+    conn.alive = False
+    with _ssh_pool.borrow(PARAMS) as fresh:
+        pass
+    assert fresh is not conn and conn.closed
+
+    with pytest.raises(RuntimeError):
+        with _ssh_pool.borrow(PARAMS) as failing:
+            raise RuntimeError("boom")
+    assert failing.closed
+    with _ssh_pool.borrow(PARAMS) as after:
+        pass
+    assert after is not failing